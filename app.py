@@ -1,10 +1,12 @@
 import os
+import asyncio
 import logging
 import traceback
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI, HTTPException, Request, Security
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse, Response
 from fastapi.security import APIKeyHeader
 from fastapi.staticfiles import StaticFiles
 from fastapi.openapi.utils import get_openapi
@@ -17,16 +19,13 @@ from models import RecommendRequest, RecommendResponse, Rationale, CitiBikeStati
 from core.logic import initial_bearing_deg, headwind_component_mph, choose_bike_type
 from services.weather import fetch_weather, parse_weather_hour
 from services.citibike import (
-    fetch_citibike,
-    merge_info_status,
-    nearest_station,
-    nearest_with_ebikes,
-    nearest_with_classic,
-    nearest_with_docks,
+    get_station_table,
+    nearby,
     find_station_by_name,
 )
-from services.mta import fetch_alerts
+from services.mta import current_alerts, refresh_alerts
 from services.geocode import geocode_one
+from services.http_client import open_client, close_client
 
 # ============  API Key Auth  ============
 API_KEY = os.getenv("PUBLIC_API_KEY", "")
@@ -38,7 +37,22 @@ def verify_key(x_api_key: str | None) -> None:
         raise HTTPException(status_code=401, detail="Unauthorized")
 
 # ============  FastAPI app  ============
-app = FastAPI(title="GET2WURK API", version="0.2.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared upstream HTTP client for the lifetime of the process
+    open_client()
+    # MTA alerts are the same for everyone; refresh them in the background
+    alerts_task = asyncio.create_task(refresh_alerts())
+    yield
+    alerts_task.cancel()
+    await close_client()
+
+app = FastAPI(
+    title="GET2WURK API",
+    version="0.2.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 # Catch-all handler so ANY unhandled exception returns JSON (not Starlette plain-text 500)
 @app.exception_handler(Exception)
@@ -67,9 +81,12 @@ if STATIC_DIR.exists():
 async def root():
     return FileResponse(STATIC_DIR / "index.html")
 
+# Health checks hit this constantly; skip serialization entirely
+_HEALTHZ_BODY = b'{"ok":true}'
+
 @app.get("/healthz")
 async def healthz():
-    return {"ok": True}
+    return Response(content=_HEALTHZ_BODY, media_type="application/json")
 
 # ============  Endpoints  ============
 @app.post("/v1/recommend", response_model=RecommendResponse)
@@ -78,16 +95,26 @@ async def recommend(
     x_api_key: str | None = Security(api_key_scheme),
 ):
     verify_key(x_api_key)
+    return await _recommend_core(req)
+
+async def _recommend_core(req: RecommendRequest) -> RecommendResponse:
+    """Recommendation logic shared by every endpoint; callers check the API key."""
+    # Weather and Citi Bike are independent — fetch them concurrently
+    async def _weather():
+        # Weather via Open-Meteo (free, no API key, reliable from cloud IPs)
+        try:
+            return await fetch_weather(req.origin.lat, req.origin.lon)
+        except Exception as exc:
+            logger.warning("Weather fetch failed: %s", exc)
+            return None
 
-    # Weather via Open-Meteo (free, no API key, reliable from cloud IPs)
-    try:
-        weather_data = await fetch_weather(req.origin.lat, req.origin.lon)
-    except Exception as exc:
-        logger.warning("Weather fetch failed: %s", exc)
-        weather_data = None
-    wind_speed_mph, wind_dir_from_deg, humidity_pct, is_precipitation = parse_weather_hour(
-        weather_data, req.depart_at.isoformat() if req.depart_at else None
+    weather_data, stations = await asyncio.gather(
+        _weather(), get_station_table(), return_exceptions=True
     )
+    if isinstance(stations, BaseException):
+        raise HTTPException(status_code=502, detail=f"Citi Bike fetch failed: {stations}")
+
+    wind_speed_mph, wind_dir_from_deg, humidity_pct, is_precipitation = parse_weather_hour(weather_data, req.depart_at)
     if wind_speed_mph is None:
         wind_speed_mph = 0
     if wind_dir_from_deg is None:
@@ -95,16 +122,11 @@ async def recommend(
     if humidity_pct is None:
         humidity_pct = 50.0
 
-    # Citi Bike data
-    try:
-        info_json, status_json = await fetch_citibike()
-    except Exception as e:
-        raise HTTPException(status_code=502, detail=f"Citi Bike fetch failed: {e}")
-    stations = merge_info_status(info_json, status_json)
-
-    # Nearest origin/dest
-    s_origin = nearest_station(req.origin.lat, req.origin.lon, stations)
-    s_dest = nearest_station(req.destination.lat, req.destination.lon, stations)
+    # One ranked pass per endpoint serves the nearest station and every Plan B lookup
+    near_origin = nearby(stations, req.origin.lat, req.origin.lon, max_meters=700.0)
+    near_dest = nearby(stations, req.destination.lat, req.destination.lon, max_meters=700.0)
+    s_origin = near_origin.nearest()
+    s_dest = near_dest.nearest()
     if not s_origin or not s_dest:
         raise HTTPException(status_code=404, detail="No nearby Citi Bike stations found.")
 
@@ -133,7 +155,7 @@ async def recommend(
 
         if bike_type == "ebike":
             if (s_origin["ebikes_available"] or 0) == 0:
-                alt, dist_m = nearest_with_ebikes(req.origin.lat, req.origin.lon, stations, max_meters=700.0)
+                alt, dist_m = near_origin.with_ebikes()
                 if alt:
                     plan_b_note = f"Origin has 0 e-bikes; nearest with e-bikes is {alt['name']} (~{int(dist_m)} m)."
                     s_origin = alt
@@ -150,8 +172,8 @@ async def recommend(
                     bike_type = "ebike"
                     plan_b_note = "No classic bikes at origin; upgraded to e-bike."
                 else:
-                    alt_e, dist_e = nearest_with_ebikes(req.origin.lat, req.origin.lon, stations, max_meters=700.0)
-                    alt_c, dist_c = nearest_with_classic(req.origin.lat, req.origin.lon, stations, max_meters=700.0)
+                    alt_e, dist_e = near_origin.with_ebikes()
+                    alt_c, dist_c = near_origin.with_classic()
                     pick = None
                     if alt_c and alt_e:
                         pick = alt_c if dist_c <= dist_e else alt_e
@@ -169,13 +191,10 @@ async def recommend(
     # Destination docks Plan B
     dock_alt_msg = None
     if bike_type in ("classic", "ebike") and (s_dest["docks_available"] or 0) < 3:
-        alt_d, dist_d = nearest_with_docks(req.destination.lat, req.destination.lon, stations, min_docks=5, max_meters=700.0)
+        alt_d, dist_d = near_dest.with_docks(min_docks=5)
         if alt_d:
             dock_alt_msg = f"Destination docks low at {s_dest['name']}; nearby with docks: {alt_d['name']} (~{int(dist_d)} m)."
 
-    # MTA alerts
-    alerts = await fetch_alerts()
-
     # Final texts
     if bike_type == "none" and not req.prefs.transit_allowed:
         recommendation = "Walking recommended; no bikes available and transit disabled in preferences."
@@ -195,25 +214,23 @@ async def recommend(
         notes = [n for n in [plan_b_note, dock_alt_msg] if n]
         plan_b = " ".join(notes) if notes else "Transit fallback if docks are full at destination."
 
-    rationale = Rationale(
-        wind_speed_mph=wind_speed_mph,
-        wind_direction_from_deg=wind_dir_from_deg,
+    # Everything below is built from already-validated or internal data, so build the
+    # models without validating them here (station dicts carry exactly the
+    # CitiBikeStation fields). FastAPI still validates the returned model once
+    # against response_model on the way out.
+    rationale = Rationale.model_construct(
+        wind_speed_mph=float(wind_speed_mph),
+        wind_direction_from_deg=float(wind_dir_from_deg),
         headwind_mph=headwind,
-        humidity_pct=humidity_pct,
+        humidity_pct=float(humidity_pct),
         is_precipitation=is_precipitation,
         rule_triggered="precipitation" if is_precipitation else f"headwind>={req.prefs.ebike_headwind_threshold_mph} or humidity>={req.prefs.humidity_threshold_pct}",
-        citibike_origin=CitiBikeStation(
-            station_id=s_origin["station_id"], name=s_origin["name"], lat=s_origin["lat"], lon=s_origin["lon"],
-            ebikes_available=s_origin["ebikes_available"], classic_available=s_origin["classic_available"], docks_available=s_origin["docks_available"]
-        ),
-        citibike_destination=CitiBikeStation(
-            station_id=s_dest["station_id"], name=s_dest["name"], lat=s_dest["lat"], lon=s_dest["lon"],
-            ebikes_available=s_dest["ebikes_available"], classic_available=s_dest["classic_available"], docks_available=s_dest["docks_available"]
-        ),
-        alerts=alerts
+        citibike_origin=CitiBikeStation.model_construct(**s_origin),
+        citibike_destination=CitiBikeStation.model_construct(**s_dest),
+        alerts=current_alerts()
     )
 
-    return RecommendResponse(
+    return RecommendResponse.model_construct(
         recommendation=recommendation,
         bike_type=bike_type if bike_type in ("classic", "ebike") else "none",
         summary=summary,
@@ -228,8 +245,10 @@ async def recommend_addr(
     x_api_key: str | None = Security(api_key_scheme),
 ):
     verify_key(x_api_key)
-    o = await geocode_one(req.origin_addr)
-    d = await geocode_one(req.destination_addr)
+    return await _recommend_addr_core(req)
+
+async def _recommend_addr_core(req: RecommendAddrRequest) -> RecommendResponse:
+    o, d = await asyncio.gather(geocode_one(req.origin_addr), geocode_one(req.destination_addr))
     if not o or not d:
         raise HTTPException(status_code=404, detail="Could not geocode one or both addresses.")
     rr = RecommendRequest(
@@ -238,12 +257,12 @@ async def recommend_addr(
         depart_at=req.depart_at,
         prefs=req.prefs
     )
-    return await recommend(rr, x_api_key=x_api_key)
+    return await _recommend_core(rr)
 
 @app.post("/v1/web", response_model=RecommendResponse)
 async def web_recommend(req: RecommendAddrRequest):
     """Public endpoint for the web frontend — no API key required."""
-    return await recommend_addr(req, x_api_key=API_KEY)
+    return await _recommend_addr_core(req)
 
 @app.get("/v1/quick")
 async def quick(
@@ -260,7 +279,7 @@ async def quick(
         destination={"lat": dest_lat, "lon": dest_lon},
     )
     setattr(rr.prefs, "preferred_dest_station_name", preferred_dest_station_name)
-    res = await recommend(rr, x_api_key=x_api_key)
+    res = await _recommend_core(rr)
     return f"{res.summary} | {res.recommendation}"
 
 # ===========  FORCE securitySchemes in OpenAPI  ===========
@@ -1,7 +1,12 @@
 import math
+from numba import njit
 
 EARTH_R = 6371000.0
 
+# Scalar kernels compiled with explicit float64 signatures: compiled once at import
+# (and cached on disk), so no request pays JIT time and int args just coerce. No
+# fastmath, so they agree with the pure-Python formulas.
+@njit("float64(float64, float64, float64, float64)", cache=True)
 def initial_bearing_deg(lat1, lon1, lat2, lon2) -> float:
     phi1, phi2 = math.radians(lat1), math.radians(lat2)
     dlon = math.radians(lon2 - lon1)
@@ -10,6 +15,7 @@ def initial_bearing_deg(lat1, lon1, lat2, lon2) -> float:
     brng = math.degrees(math.atan2(y, x))
     return (brng + 360.0) % 360.0
 
+@njit("float64(float64, float64, float64, float64)", cache=True)
 def haversine_m(lat1, lon1, lat2, lon2) -> float:
     dlat = math.radians(lat2 - lat1)
     dlon = math.radians(lon2 - lon1)
@@ -17,6 +23,7 @@ def haversine_m(lat1, lon1, lat2, lon2) -> float:
     c = 2 * math.asin(math.sqrt(a))
     return EARTH_R * c
 
+# A cos and a multiply: plain Python beats the njit call overhead here
 def headwind_component_mph(wind_dir_from_deg: float, route_bearing_deg: float, wind_speed_mph: float) -> float:
     rel = math.radians((wind_dir_from_deg - route_bearing_deg) % 360.0)
     return wind_speed_mph * math.cos(rel)
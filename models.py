@@ -1,8 +1,10 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Literal
 from datetime import datetime
 
 class LatLon(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     lat: float = Field(ge=-90, le=90)
     lon: float = Field(ge=-180, le=180)
 
@@ -17,9 +19,11 @@ class RecommendRequest(BaseModel):
     origin: LatLon
     destination: LatLon
     depart_at: Optional[datetime] = None
-    prefs: Prefs = Prefs()
+    prefs: Prefs = Field(default_factory=Prefs)
 
 class CitiBikeStation(BaseModel):
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
     station_id: str
     name: str
     lat: float
@@ -37,7 +41,7 @@ class Rationale(BaseModel):
     rule_triggered: Optional[str] = None
     citibike_origin: Optional[CitiBikeStation] = None
     citibike_destination: Optional[CitiBikeStation] = None
-    alerts: List[str] = []
+    alerts: List[str] = Field(default_factory=list)
 
 class RecommendResponse(BaseModel):
     recommendation: str
@@ -51,4 +55,4 @@ class RecommendAddrRequest(BaseModel):
     origin_addr: str
     destination_addr: str
     depart_at: Optional[datetime] = None
-    prefs: Prefs = Prefs()
+    prefs: Prefs = Field(default_factory=Prefs)
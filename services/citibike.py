@@ -1,84 +1,296 @@
 import os
-import httpx
+import math
+import time
+import asyncio
+import logging
+import orjson
+import numpy as np
+from dataclasses import dataclass
+from scipy.spatial import cKDTree
 from typing import Dict, Any, List, Tuple, Optional
-from core.logic import haversine_m
+from core.logic import EARTH_R, haversine_m
+from services import http_client
+from services.singleflight import SingleFlight
+
+logger = logging.getLogger("get2wurk")
 
 GBFS_BASE = os.getenv("CITIBIKE_GBFS_BASE", "https://gbfs.citibikenyc.com/gbfs/en")
 INFO_URL = f"{GBFS_BASE}/station_information.json"
 STATUS_URL = f"{GBFS_BASE}/station_status.json"
 
-async def fetch_citibike() -> Tuple[Dict[str, Any], Dict[str, Any]]:
-    async with httpx.AsyncClient(timeout=15) as client:
-        info = await client.get(INFO_URL)
-        status = await client.get(STATUS_URL)
-        info.raise_for_status(); status.raise_for_status()
-        return info.json(), status.json()
-
-def nearest_station(lat: float, lon: float, stations: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
-    best = None
-    best_d = 1e18
-    for s in stations:
-        slat = s.get("lat"); slon = s.get("lon")
-        if slat is None or slon is None:
-            continue
-        d = haversine_m(lat, lon, slat, slon)
-        if d < best_d:
-            best = s; best_d = d
-    return best
-
-def merge_info_status(info_json: Dict[str, Any], status_json: Dict[str, Any]) -> List[Dict[str, Any]]:
-    info_map = {s["station_id"]: s for s in info_json.get("data", {}).get("stations", [])}
-    out = []
+# Preferred destination stations (comma-separated), resolved once per table build
+PREFERRED_STATION_NAMES = [
+    n.strip() for n in os.getenv("PREFERRED_STATION_NAMES", "W 58 St & 11 Ave").split(",") if n.strip()
+]
+
+# station_status updates every ~10s; station_information changes about daily
+STATUS_TTL_S = 15.0
+INFO_TTL_S = 3600.0
+# After a failed refresh, wait this long before asking GBFS again
+FAILURE_TTL_S = 5.0
+# How old a table may get while GBFS is failing before requests get errors instead
+MAX_STALE_S = 300.0
+
+_cache: Dict[str, Any] = {
+    "table": None, "info_ts": 0.0, "status_ts": 0.0, "fail_ts": None, "fail_exc": None,
+}
+# Concurrent requests that find the table stale share one refresh and its outcome
+_refresh = SingleFlight()
+
+async def fetch_citibike(attempts: int = http_client.RETRY_ATTEMPTS) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    info, status = await asyncio.gather(
+        http_client.get(INFO_URL, attempts=attempts), http_client.get(STATUS_URL, attempts=attempts)
+    )
+    info.raise_for_status(); status.raise_for_status()
+    return orjson.loads(info.content), orjson.loads(status.content)
+
+async def fetch_status(attempts: int = http_client.RETRY_ATTEMPTS) -> Dict[str, Any]:
+    status = await http_client.get(STATUS_URL, attempts=attempts)
+    status.raise_for_status()
+    return orjson.loads(status.content)
+
+@dataclass
+class StationTable:
+    """Station columns for vectorized queries.
+
+    The info columns come from station_information and are rebuilt hourly; the
+    availability columns and KD-tree are refreshed in place from station_status.
+    """
+    station_ids: List[str]
+    names: List[Optional[str]]
+    lat: np.ndarray
+    lon: np.ndarray
+    lat_rad: np.ndarray
+    lon_rad: np.ndarray
+    xyz: np.ndarray
+    sid_to_idx: Dict[str, int]
+    # Normalized name -> first active row with it, in status-feed order;
+    # rebuilt with the availability columns by apply_status
+    name_map: Dict[str, int]
+    # Normalized PREFERRED_STATION_NAMES -> active row, including substring matches
+    preferred_defaults: Dict[str, int]
+    ebikes: np.ndarray
+    classic: np.ndarray
+    docks: np.ndarray
+    # Stations present in the latest status feed; only these are ever returned
+    active: np.ndarray
+    # KD-tree over the active stations; tree_idx maps tree positions to rows
+    tree: cKDTree
+    tree_idx: np.ndarray
+
+    def station(self, i: int) -> Dict[str, Any]:
+        return {
+            "station_id": self.station_ids[i],
+            "name": self.names[i],
+            "lat": float(self.lat[i]),
+            "lon": float(self.lon[i]),
+            "ebikes_available": int(self.ebikes[i]),
+            "classic_available": int(self.classic[i]),
+            "docks_available": int(self.docks[i]),
+        }
+
+def _unit_xyz(lat_rad, lon_rad) -> np.ndarray:
+    # Points on the unit sphere: straight-line (chord) distance between them ranks
+    # exactly like great-circle distance, so a plain Euclidean KD-tree works.
+    lat_rad = np.atleast_1d(lat_rad); lon_rad = np.atleast_1d(lon_rad)
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat*np.cos(lon_rad), cos_lat*np.sin(lon_rad), np.sin(lat_rad)))
+
+def _chord(meters: float) -> float:
+    return 2 * math.sin(meters / (2 * EARTH_R))
+
+def build_station_table(info_json: Dict[str, Any]) -> StationTable:
+    # Stations without coordinates can't be ranked by distance
+    info = [
+        s for s in info_json.get("data", {}).get("stations", [])
+        if s.get("lat") is not None and s.get("lon") is not None
+    ]
+    n = len(info)
+    names = [s.get("name") for s in info]
+    lat = np.array([s["lat"] for s in info], dtype=np.float64)
+    lon = np.array([s["lon"] for s in info], dtype=np.float64)
+    lat_rad, lon_rad = np.radians(lat), np.radians(lon)
+    return StationTable(
+        station_ids=[s["station_id"] for s in info],
+        names=names,
+        lat=lat,
+        lon=lon,
+        lat_rad=lat_rad,
+        lon_rad=lon_rad,
+        xyz=_unit_xyz(lat_rad, lon_rad),
+        sid_to_idx={s["station_id"]: i for i, s in enumerate(info)},
+        name_map={},
+        preferred_defaults={},
+        ebikes=np.zeros(n, dtype=np.int16),
+        classic=np.zeros(n, dtype=np.int16),
+        docks=np.zeros(n, dtype=np.int16),
+        active=np.zeros(n, dtype=bool),
+        tree=cKDTree(np.empty((0, 3))),
+        tree_idx=np.empty(0, dtype=np.intp),
+    )
+
+def _index_names(table: StationTable, idx: List[int]) -> None:
+    # Several stations can share a name; the first one still reporting wins
+    name_map: Dict[str, int] = {}
+    for i in idx:
+        name_map.setdefault((table.names[i] or "").strip().lower(), i)
+    preferred_defaults: Dict[str, int] = {}
+    for target in (n.lower() for n in PREFERRED_STATION_NAMES):
+        i = name_map.get(target)
+        if i is None:
+            i = next((j for nm, j in name_map.items() if target in nm), None)
+        if i is not None:
+            preferred_defaults[target] = i
+    table.name_map, table.preferred_defaults = name_map, preferred_defaults
+
+def apply_status(table: StationTable, status_json: Dict[str, Any]) -> None:
+    idx, ebikes, classic, docks = [], [], [], []
+    sid_to_idx = table.sid_to_idx
     for st in status_json.get("data", {}).get("stations", []):
-        sid = st.get("station_id")
-        base = info_map.get(sid, {})
-        out.append({
-            "station_id": sid,
-            "name": base.get("name"),
-            "lat": base.get("lat"),
-            "lon": base.get("lon"),
-            "ebikes_available": st.get("num_ebikes_available", 0) or 0,
-            "classic_available": st.get("num_bikes_available", 0) or 0,
-            "docks_available": st.get("num_docks_available", 0) or 0,
-        })
-    return out
-
-def nearest_with_ebikes(lat: float, lon: float, stations, max_meters: float = 700.0):
-    best, best_d = None, 1e18
-    for s in stations:
-        if (s.get("ebikes_available") or 0) > 0:
-            d = haversine_m(lat, lon, s.get("lat"), s.get("lon"))
-            if d < best_d:
-                best, best_d = s, d
-    return (best, best_d) if best_d <= max_meters else (None, None)
-
-def nearest_with_classic(lat: float, lon: float, stations, max_meters: float = 700.0):
-    best, best_d = None, 1e18
-    for s in stations:
-        if (s.get("classic_available") or 0) > 0:
-            d = haversine_m(lat, lon, s.get("lat"), s.get("lon"))
-            if d < best_d:
-                best, best_d = s, d
-    return (best, best_d) if best_d <= max_meters else (None, None)
-
-def nearest_with_docks(lat: float, lon: float, stations, min_docks: int = 3, max_meters: float = 700.0):
-    best, best_d = None, 1e18
-    for s in stations:
-        if (s.get("docks_available") or 0) >= min_docks:
-            d = haversine_m(lat, lon, s.get("lat"), s.get("lon"))
-            if d < best_d:
-                best, best_d = s, d
-    return (best, best_d) if best_d <= max_meters else (None, None)
-
-def find_station_by_name(stations, name: str):
+        i = sid_to_idx.get(st.get("station_id"))
+        if i is None:
+            continue
+        idx.append(i)
+        ebikes.append(st.get("num_ebikes_available", 0) or 0)
+        classic.append(st.get("num_bikes_available", 0) or 0)
+        docks.append(st.get("num_docks_available", 0) or 0)
+    active = np.zeros(len(table.station_ids), dtype=bool)
+    active[idx] = True
+    for col, vals in ((table.ebikes, ebikes), (table.classic, classic), (table.docks, docks)):
+        col.fill(0)
+        col[idx] = vals
+    _index_names(table, idx)
+    # The set of reporting stations rarely changes; only then rebuild the tree
+    if not np.array_equal(active, table.active):
+        table.active = active
+        table.tree_idx = np.flatnonzero(active)
+        table.tree = cKDTree(table.xyz[table.tree_idx])
+
+def merge_info_status(info_json: Dict[str, Any], status_json: Dict[str, Any]) -> StationTable:
+    table = build_station_table(info_json)
+    apply_status(table, status_json)
+    return table
+
+def _cached_table(now: float) -> Optional[StationTable]:
+    if _cache["table"] is not None and now - _cache["status_ts"] < STATUS_TTL_S:
+        return _cache["table"]
+    return None
+
+async def _refresh_table() -> StationTable:
+    now = time.monotonic()
+    # With a table to fall back on, fail fast instead of sitting through the 429/5xx
+    # backoff; the next refresh after FAILURE_TTL_S is the retry
+    attempts = 1 if _cache["table"] is not None else http_client.RETRY_ATTEMPTS
+    try:
+        if _cache["table"] is None or now - _cache["info_ts"] >= INFO_TTL_S:
+            info_json, status_json = await fetch_citibike(attempts)
+            table = merge_info_status(info_json, status_json)
+            _cache["table"], _cache["info_ts"] = table, now
+        else:
+            table = _cache["table"]
+            apply_status(table, await fetch_status(attempts))
+    except Exception as exc:
+        logger.warning("Citi Bike refresh failed: %s", exc)
+        _cache["fail_ts"], _cache["fail_exc"] = time.monotonic(), exc
+        raise
+    _cache["status_ts"] = now
+    _cache["fail_ts"] = _cache["fail_exc"] = None
+    return table
+
+def _stale_or_raise(exc: BaseException) -> StationTable:
+    # A slightly old table beats a 502 while GBFS is down
+    table = _cache["table"]
+    if table is not None and time.monotonic() - _cache["status_ts"] < MAX_STALE_S:
+        return table
+    raise exc
+
+async def get_station_table() -> StationTable:
+    """Station table, refetching the GBFS feeds only once they go stale.
+
+    If the refresh fails, the last table is served for up to MAX_STALE_S, and
+    GBFS is not retried for FAILURE_TTL_S.
+    """
+    now = time.monotonic()
+    table = _cached_table(now)
+    if table is not None:
+        return table
+    if _cache["fail_ts"] is not None and now - _cache["fail_ts"] < FAILURE_TTL_S:
+        return _stale_or_raise(_cache["fail_exc"])
+    try:
+        return await _refresh.do("table", _refresh_table)
+    except Exception as exc:
+        return _stale_or_raise(exc)
+
+def _query_point(lat: float, lon: float) -> np.ndarray:
+    return _unit_xyz(math.radians(lat), math.radians(lon))[0]
+
+def nearest_station(lat: float, lon: float, table: StationTable) -> Optional[Dict[str, Any]]:
+    if table.tree_idx.size == 0:
+        return None
+    _, k = table.tree.query(_query_point(lat, lon))
+    return table.station(int(table.tree_idx[k]))
+
+def _equirect_sqm(lat_query: float, lon_query: float, lat_rad: np.ndarray, lon_rad: np.ndarray) -> np.ndarray:
+    # Squared equirectangular distance (m^2): ranks like haversine at city scale
+    # for one cos instead of several trig calls per station.
+    phi = math.radians(lat_query)
+    dx = (lon_rad - math.radians(lon_query)) * (math.cos(phi) * EARTH_R)
+    dy = (lat_rad - phi) * EARTH_R
+    return dx*dx + dy*dy
+
+@dataclass
+class Nearby:
+    """Stations within max_meters of one point, ranked once and shared by the
+    nearest / e-bikes / classic / docks lookups for that point."""
+    table: StationTable
+    lat: float
+    lon: float
+    max_meters: float
+    # Table rows within max_meters, nearest first
+    rows: np.ndarray
+
+    def nearest(self) -> Optional[Dict[str, Any]]:
+        if self.rows.size:
+            return self.table.station(int(self.rows[0]))
+        # Nothing within max_meters; the tree still finds the closest station
+        return nearest_station(self.lat, self.lon, self.table)
+
+    def _first_with(self, counts: np.ndarray, min_count: int):
+        hits = np.flatnonzero(counts[self.rows] >= min_count)
+        if hits.size == 0:
+            return None, None
+        i = int(self.rows[hits[0]])
+        # Exact distance only for the winner, for the "~X m" note
+        best_d = haversine_m(self.lat, self.lon, self.table.lat[i], self.table.lon[i])
+        return (self.table.station(i), best_d) if best_d <= self.max_meters else (None, None)
+
+    def with_ebikes(self):
+        return self._first_with(self.table.ebikes, 1)
+
+    def with_classic(self):
+        return self._first_with(self.table.classic, 1)
+
+    def with_docks(self, min_docks: int = 3):
+        return self._first_with(self.table.docks, min_docks)
+
+def nearby(table: StationTable, lat: float, lon: float, max_meters: float = 700.0) -> Nearby:
+    if table.tree_idx.size == 0:
+        rows = np.empty(0, dtype=np.intp)
+    else:
+        rows = table.tree_idx[np.asarray(table.tree.query_ball_point(_query_point(lat, lon), _chord(max_meters)), dtype=np.intp)]
+        rows = rows[np.argsort(_equirect_sqm(lat, lon, table.lat_rad[rows], table.lon_rad[rows]), kind="stable")]
+    return Nearby(table=table, lat=lat, lon=lon, max_meters=max_meters, rows=rows)
+
+def find_station_by_name(table: StationTable, name: str):
     target = (name or "").strip().lower()
     if not target:
         return None
-    for s in stations:
-        if (s.get("name") or "").strip().lower() == target:
-            return s
-    for s in stations:
-        nm = (s.get("name") or "").lower()
+    i = table.name_map.get(target)
+    if i is None:
+        i = table.preferred_defaults.get(target)
+    if i is not None:
+        return table.station(i)
+    for nm, i in table.name_map.items():
         if target in nm:
-            return s
+            return table.station(i)
     return None
@@ -1,12 +1,24 @@
 import re
-import httpx
+import orjson
+from functools import lru_cache
+from cachetools import TTLCache
 from typing import Optional, Tuple
+from services import http_client
+from services.singleflight import SingleFlight
 
 NOMINATIM = "https://nominatim.openstreetmap.org/search"
 
+# Lookups keyed on the normalized, lowercased, whitespace-collapsed query. Home/work
+# addresses repeat constantly and Nominatim asks for at most 1 req/s. Misses are
+# remembered briefly so a bad address can't hammer Nominatim with retries.
+_GEO_CACHE: TTLCache = TTLCache(maxsize=4096, ttl=86400)
+_GEO_MISSES: TTLCache = TTLCache(maxsize=1024, ttl=60)
+# Concurrent lookups of the same key share one Nominatim round
+_GEO_INFLIGHT = SingleFlight()
+
 # NYC bounding box (generous — includes all 5 boroughs + close suburbs)
-_NYC_LAT = (40.49, 40.92)
-_NYC_LON = (-74.26, -73.68)
+_NYC_MIN_LAT, _NYC_MAX_LAT = 40.49, 40.92
+_NYC_MIN_LON, _NYC_MAX_LON = -74.26, -73.68
 
 # Convert spoken ordinals to numeric form so Nominatim doesn't route to
 # the wrong city (e.g. "Tenth Ave" → Albany instead of Manhattan).
@@ -15,48 +27,84 @@ _ORDINALS = {
     "fifth": "5th", "sixth": "6th", "seventh": "7th", "eighth": "8th",
     "ninth": "9th", "tenth": "10th", "eleventh": "11th", "twelfth": "12th",
 }
+# Common spellings precomputed so most matches skip the per-match .lower()
+_ORDINAL_SUBS = {
+    variant: num
+    for word, num in _ORDINALS.items()
+    for variant in (word, word.title(), word.upper())
+}
+# Addresses are ASCII; re.ASCII keeps \b and IGNORECASE off the Unicode tables
 _ORDINAL_RE = re.compile(
-    r'\b(' + '|'.join(_ORDINALS.keys()) + r')\b', re.IGNORECASE
+    r'\b(' + '|'.join(_ORDINALS.keys()) + r')\b', re.IGNORECASE | re.ASCII
 )
 
 
-def _normalize(query: str) -> str:
-    return _ORDINAL_RE.sub(lambda m: _ORDINALS[m.group(0).lower()], query)
+def _ordinal_sub(m: re.Match) -> str:
+    word = m.group(1)
+    return _ORDINAL_SUBS.get(word) or _ORDINALS[word.lower()]
 
 
-def _in_nyc(lat: float, lon: float) -> bool:
-    return _NYC_LAT[0] <= lat <= _NYC_LAT[1] and _NYC_LON[0] <= lon <= _NYC_LON[1]
+# Pure and called on every geocode (cache key and request); queries repeat a lot
+@lru_cache(maxsize=2048)
+def _normalize(query: str) -> str:
+    return _ORDINAL_RE.sub(_ordinal_sub, query)
 
 
 async def geocode_one(query: str) -> Optional[Tuple[float, float]]:
+    key = " ".join(_normalize(query).lower().split())
+    hit = _GEO_CACHE.get(key)
+    if hit is not None:
+        return hit
+    if key in _GEO_MISSES:
+        return None
+    return await _GEO_INFLIGHT.do(key, lambda: _geocode_and_cache(query, key))
+
+
+async def _geocode_and_cache(query: str, key: str) -> Optional[Tuple[float, float]]:
+    result = await _geocode_uncached(query)
+    if result is not None:
+        _GEO_CACHE[key] = result
+    else:
+        _GEO_MISSES[key] = True
+    return result
+
+
+async def _geocode_uncached(query: str) -> Optional[Tuple[float, float]]:
     normalized = _normalize(query)
-    headers = {"User-Agent": "GET2WURK/0.2 (demo)"}
 
     # Queries to try in order: normalized first, then with ", Manhattan NY" appended
     candidates = [normalized]
     if normalized != query or "manhattan" not in query.lower():
         candidates.append(normalized + ", Manhattan NY")
 
-    async with httpx.AsyncClient(timeout=15, headers=headers) as client:
-        last_data = None
-        for q in candidates:
-            params = {
-                "q": q, "format": "json", "limit": 5,
-                "addressdetails": 0, "countrycodes": "us",
-            }
-            r = await client.get(NOMINATIM, params=params)
+    # Issue candidates one at a time: the retry is only sent when the previous
+    # answer had no NYC hit, which keeps us inside Nominatim's 1 req/s policy
+    last_data = None
+    error = None
+    for q in candidates:
+        params = {
+            "q": q, "format": "json", "limit": 5,
+            "addressdetails": 0, "countrycodes": "us",
+        }
+        try:
+            r = await http_client.get(NOMINATIM, params=params)
             r.raise_for_status()
-            data = r.json()
-            if not data:
-                continue
-            last_data = data
-            # Prefer any result inside the NYC bounding box
-            for item in data:
-                lat, lon = float(item["lat"]), float(item["lon"])
-                if _in_nyc(lat, lon):
-                    return lat, lon
-
-        # Nothing in NYC bounding box — fall back to first result from any query
-        if last_data:
-            return float(last_data[0]["lat"]), float(last_data[0]["lon"])
-        return None
+        except Exception as exc:
+            error = error or exc
+            continue
+        data = orjson.loads(r.content)
+        if not data:
+            continue
+        last_data = data
+        # Prefer any result inside the NYC bounding box
+        for item in data:
+            lat, lon = float(item["lat"]), float(item["lon"])
+            if _NYC_MIN_LAT <= lat <= _NYC_MAX_LAT and _NYC_MIN_LON <= lon <= _NYC_MAX_LON:
+                return lat, lon
+
+    # Nothing in NYC bounding box — fall back to first result from any query
+    if last_data:
+        return float(last_data[0]["lat"]), float(last_data[0]["lon"])
+    if error is not None:
+        raise error
+    return None
@@ -0,0 +1,63 @@
+import asyncio
+import httpx
+from typing import Optional
+
+# One pooled client shared by every upstream call (GBFS, Open-Meteo, Nominatim) so
+# requests reuse open connections instead of redoing DNS + TCP + TLS each time.
+# Opened and closed by the app lifespan in app.py; opened lazily on first use when
+# the services are called outside the app (scripts, a REPL).
+HTTP: Optional[httpx.AsyncClient] = None
+
+# Sent on every request; Nominatim's usage policy requires an identifying UA
+USER_AGENT = "GET2WURK/0.2 (demo)"
+
+# Statuses worth retrying (rate limiting / transient upstream trouble)
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_ATTEMPTS = 3
+RETRY_BASE_DELAY_S = 0.5
+RETRY_MAX_DELAY_S = 5.0
+
+def open_client() -> httpx.AsyncClient:
+    global HTTP
+    # The transport retries failed connects; http2 and limits live on it because a
+    # client given a transport ignores its own
+    transport = httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60),
+    )
+    HTTP = httpx.AsyncClient(timeout=15, transport=transport, headers={"User-Agent": USER_AGENT})
+    return HTTP
+
+async def close_client() -> None:
+    global HTTP
+    if HTTP is not None:
+        await HTTP.aclose()
+        HTTP = None
+
+def get_client() -> httpx.AsyncClient:
+    # Construction is synchronous, so no lock is needed around the lazy open
+    if HTTP is None:
+        return open_client()
+    return HTTP
+
+def _retry_delay(r: httpx.Response, attempt: int) -> float:
+    retry_after = r.headers.get("Retry-After", "")
+    if retry_after.isdigit():
+        return min(float(retry_after), RETRY_MAX_DELAY_S)
+    return min(RETRY_BASE_DELAY_S * 2 ** attempt, RETRY_MAX_DELAY_S)
+
+async def get(url: str, *, attempts: int = RETRY_ATTEMPTS, **kwargs) -> httpx.Response:
+    """GET on the shared client, backing off and retrying on 429/5xx.
+
+    Returns the last response; callers still call raise_for_status(). The
+    backoff sleeps, so callers that have something to fall back on (or hold a
+    lock) should pass attempts=1 rather than make others wait on it.
+    """
+    client = get_client()
+    for attempt in range(attempts):
+        r = await client.get(url, **kwargs)
+        if r.status_code not in RETRY_STATUSES or attempt == attempts - 1:
+            return r
+        await asyncio.sleep(_retry_delay(r, attempt))
+    return r
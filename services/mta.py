@@ -1,2 +1,25 @@
+import asyncio
+import logging
+from typing import List
+
+logger = logging.getLogger("get2wurk")
+
+ALERTS_REFRESH_S = 30.0
+
+# Latest alerts snapshot, shared by every request; kept fresh by refresh_alerts()
+_alerts: List[str] = []
+
 async def fetch_alerts(route_ids=None):
     return []
+
+def current_alerts() -> List[str]:
+    return _alerts
+
+async def refresh_alerts() -> None:
+    global _alerts
+    while True:
+        try:
+            _alerts = await fetch_alerts()
+        except Exception as exc:
+            logger.warning("MTA alerts refresh failed: %s", exc)
+        await asyncio.sleep(ALERTS_REFRESH_S)
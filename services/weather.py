@@ -1,5 +1,10 @@
-import httpx
-from typing import Optional, Dict, Any, Tuple
+import time
+import orjson
+from cachetools import TTLCache
+from datetime import datetime
+from typing import Optional, Dict, Any, NamedTuple
+from services import http_client
+from services.singleflight import SingleFlight
 
 OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 
@@ -8,45 +13,96 @@ OPEN_METEO_URL = "https://api.open-meteo.com/v1/forecast"
 # 71-77: snow / snow grains
 # 80-86: rain showers / snow showers
 # 95-99: thunderstorm
-PRECIP_CODES = frozenset(range(51, 68)) | frozenset(range(71, 78)) | frozenset(range(80, 87)) | {95, 96, 99}
+# Codes are all < 100, so membership is a bit test on one int
+_PRECIP_MASK = 0
+for _code in [*range(51, 68), *range(71, 78), *range(80, 87), 95, 96, 99]:
+    _PRECIP_MASK |= 1 << _code
+del _code
+
+# Forecasts per ~110 m cell (lat/lon rounded to 3 decimals) and clock hour, kept
+# for 10 minutes. The hour in the key means a forecast is never served past the
+# hour it was fetched in (e.g. a forecast_days=1 response after local midnight).
+_FORECAST_CACHE: TTLCache = TTLCache(maxsize=2048, ttl=600)
+# Concurrent misses for the same cell share one upstream request
+_FORECAST_INFLIGHT = SingleFlight()
 
 
 async def fetch_weather(lat: float, lon: float) -> Optional[Dict[str, Any]]:
+    key = (round(lat, 3), round(lon, 3), int(time.time() // 3600))
+    hit = _FORECAST_CACHE.get(key)
+    if hit is not None:
+        return hit
+    return await _FORECAST_INFLIGHT.do(key, lambda: _fetch_forecast(key))
+
+
+async def _fetch_forecast(key) -> Dict[str, Any]:
     params = {
-        "latitude": lat,
-        "longitude": lon,
+        "latitude": key[0],
+        "longitude": key[1],
         "hourly": "windspeed_10m,winddirection_10m,relativehumidity_2m,precipitation,weathercode",
         "wind_speed_unit": "mph",
         "forecast_days": 1,
         "timezone": "America/New_York",
     }
-    async with httpx.AsyncClient(timeout=15) as client:
-        r = await client.get(OPEN_METEO_URL, params=params)
-        r.raise_for_status()
-        return r.json()
+    r = await http_client.get(OPEN_METEO_URL, params=params)
+    r.raise_for_status()
+    data = orjson.loads(r.content)
+    _FORECAST_CACHE[key] = data
+    return data
+
+
+class WeatherHour(NamedTuple):
+    wind_speed_mph: Optional[float]
+    wind_dir_deg: Optional[float]
+    humidity_pct: Optional[float]
+    is_precipitation: bool
+
+
+_NO_WEATHER = WeatherHour(None, None, None, False)
+
+
+def _hour_index(weather_json: Dict[str, Any], times) -> Dict[datetime, int]:
+    # Built once per response and kept on it (responses live in _FORECAST_CACHE),
+    # so every later lookup is a single dict hit
+    index = weather_json.get("_hour_index")
+    if index is None:
+        index = {}
+        for i, t in enumerate(times):
+            index.setdefault(datetime.fromisoformat(t[:13] + ":00"), i)
+        weather_json["_hour_index"] = index
+    return index
+
+
+def _is_precipitation(weathercode: int, precip: float) -> bool:
+    return (weathercode >= 0 and (_PRECIP_MASK >> weathercode) & 1 == 1) or (precip > 0.0)
 
 
 def parse_weather_hour(
     weather_json: Optional[Dict[str, Any]],
-    iso_timestamp: Optional[str] = None,
-) -> Tuple[Optional[float], Optional[float], Optional[float], bool]:
-    """Return (wind_speed_mph, wind_dir_deg, humidity_pct, is_precipitation)."""
+    when: Optional[datetime] = None,
+) -> WeatherHour:
+    """Return the WeatherHour for `when`; the first hour if unset or not in the forecast."""
     if not weather_json:
-        return None, None, None, False
+        return _NO_WEATHER
 
     hourly = weather_json.get("hourly", {})
     times = hourly.get("time", [])
     if not times:
-        return None, None, None, False
+        return _NO_WEATHER
 
-    # Find the matching hour; default to the first entry
-    idx = 0
-    if iso_timestamp:
-        target = iso_timestamp[:13]  # e.g. "2026-02-22T16"
-        for i, t in enumerate(times):
-            if t[:13] == target:
-                idx = i
-                break
+    # No departure time: the first entry, read straight off each series
+    if not when:
+        ws = hourly.get("windspeed_10m") or [None]
+        wd = hourly.get("winddirection_10m") or [None]
+        rh = hourly.get("relativehumidity_2m") or [None]
+        pr = hourly.get("precipitation") or [0.0]
+        wc = hourly.get("weathercode") or [0]
+        return WeatherHour(ws[0], wd[0], rh[0], _is_precipitation(int(wc[0] or 0), pr[0] or 0.0))
+
+    # Find the matching hour; default to the first entry. Open-Meteo times are
+    # local wall-clock hours, compared against the wall-clock hour of `when`.
+    target = when.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+    idx = _hour_index(weather_json, times).get(target, 0)
 
     def _get(field: str, fallback=None):
         vals = hourly.get(field, [])
@@ -58,6 +114,4 @@ def parse_weather_hour(
     precip      = _get("precipitation", 0.0) or 0.0
     weathercode = int(_get("weathercode", 0) or 0)
 
-    is_precipitation = (weathercode in PRECIP_CODES) or (precip > 0.0)
-
-    return wind_speed, wind_dir, humidity, is_precipitation
+    return WeatherHour(wind_speed, wind_dir, humidity, _is_precipitation(weathercode, precip))